@@ -1,4 +1,5 @@
 
+import multiprocessing
 import sys
 import os
 
@@ -8,4 +9,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 from nebulapilot.app_gui import main
 
 if __name__ == "__main__":
+    # Required for the frozen Windows build: without this, ProcessPoolExecutor
+    # workers spawned by the organizer re-execute the entry script and open
+    # stray GUI windows instead of coming up as pool workers.
+    multiprocessing.freeze_support()
     main()
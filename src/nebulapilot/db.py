@@ -4,6 +4,15 @@ from pathlib import Path
 
 DEFAULT_DB_PATH = Path.home() / ".nebulapilot" / "nebulapilot.db"
 
+HEADER_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS header_cache (
+    path TEXT PRIMARY KEY,
+    mtime REAL,
+    size INTEGER,
+    metadata_json TEXT
+)
+"""
+
 def get_db_connection(db_path=None):
     if db_path is None:
         db_path = DEFAULT_DB_PATH
@@ -61,9 +70,54 @@ def init_db(db_path=None):
     )
     """)
     
+    # Header cache: parsed FITS metadata keyed by (path, mtime, size) so
+    # repeat scans of unchanged files skip the FITS read entirely
+    cursor.execute(HEADER_CACHE_SCHEMA)
+
     conn.commit()
     conn.close()
 
+def load_header_cache(db_path=None):
+    """Load the FITS header cache as {path: (mtime, size, metadata_json)}."""
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+    cursor.execute(HEADER_CACHE_SCHEMA)
+    cursor.execute("SELECT path, mtime, size, metadata_json FROM header_cache")
+    rows = cursor.fetchall()
+    conn.close()
+    return {row["path"]: (row["mtime"], row["size"], row["metadata_json"]) for row in rows}
+
+def save_header_cache(entries, db_path=None):
+    """Upsert (path, mtime, size, metadata_json) cache rows in one transaction."""
+    if not entries:
+        return
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+    cursor.execute(HEADER_CACHE_SCHEMA)
+    cursor.executemany(
+        "INSERT OR REPLACE INTO header_cache (path, mtime, size, metadata_json) VALUES (?, ?, ?, ?)",
+        entries
+    )
+    conn.commit()
+    conn.close()
+
+def prune_header_cache(db_path=None):
+    """Drop cache rows whose file no longer exists on disk.
+
+    The organizer moves every file it processes, so rows for a source tree
+    die after the run that created them; without pruning the table grows
+    without bound across capture sessions.
+    """
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+    cursor.execute(HEADER_CACHE_SCHEMA)
+    cursor.execute("SELECT path FROM header_cache")
+    dead = [(row["path"],) for row in cursor.fetchall() if not os.path.exists(row["path"])]
+    if dead:
+        cursor.executemany("DELETE FROM header_cache WHERE path = ?", dead)
+        conn.commit()
+    conn.close()
+
 def add_target(name, goals=None, db_path=None):
     conn = get_db_connection(db_path)
     cursor = conn.cursor()
@@ -135,6 +189,37 @@ def add_frame(frame_data, db_path=None):
     conn.commit()
     conn.close()
 
+def add_targets_bulk(names, db_path=None):
+    """Insert many targets with default goals in a single transaction."""
+    if not names:
+        return
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+    # Default goals: L=80, RGB=60, SHO=100 frames
+    goals = (80, 60, 60, 60, 100, 100, 100)
+    cursor.executemany(
+        "INSERT OR IGNORE INTO targets (name, goal_l, goal_r, goal_g, goal_b, goal_s, goal_h, goal_o) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(name, *goals) for name in names]
+    )
+    conn.commit()
+    conn.close()
+
+def add_frames_bulk(frames, db_path=None):
+    """Insert many frames in a single transaction instead of one commit per row."""
+    if not frames:
+        return
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT OR REPLACE INTO frames (
+            path, target_name, filter, exptime_sec, date_obs,
+            fwhm, eccentricity, star_count, background, decision, score
+        ) VALUES (:path, :target_name, :filter, :exptime_sec, :date_obs,
+                  :fwhm, :eccentricity, :star_count, :background, :decision, :score)
+    """, frames)
+    conn.commit()
+    conn.close()
+
 def get_target_progress(target_name, db_path=None):
     conn = get_db_connection(db_path)
     cursor = conn.cursor()
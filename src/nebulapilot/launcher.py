@@ -1,3 +1,4 @@
+import atexit
 import shutil
 import subprocess
 import os
@@ -10,9 +11,36 @@ from copy import deepcopy
 from .db import get_target_files
 
 
+# Single-pass backslash->slash table; translate is faster than replace
+# for the long paths this converts.
+_WIN_TO_JS = str.maketrans({"\\": "/"})
+
+
 def _to_js_path(p):
     """Convert a Windows path to forward-slash format for PJSR."""
-    return str(p).replace("\\", "/")
+    return str(p).translate(_WIN_TO_JS)
+
+
+# Gaia DR3 database path baked into every runner script (USER PROVIDED).
+_GAIA_PATH = "D:/Program Files/PixInsight/library/gaia"
+
+# The runner script is constant apart from the WBPP include path, so assemble
+# it once at import time; generate_and_run only substitutes {wbpp_js}.
+_RUNNER_TEMPLATE = (
+    '// Configure Gaia DR3 Database Path\n'
+    'try {\n'
+    f'   if (File.directoryExists("{_GAIA_PATH}")) {{\n'
+    f'      Settings.write("StarCatalogs/Gaia/DR3/DatabaseFilePaths", ["{_GAIA_PATH}"]);\n'
+    f'      console.writeln("nebulaPilot: Configured Gaia DR3 path: {_GAIA_PATH}");\n'
+    '   } else {\n'
+    f'      console.warningln("nebulaPilot: Gaia path not found: {_GAIA_PATH}");\n'
+    '   }\n'
+    '} catch (e) {\n'
+    '   console.criticalln("nebulaPilot: Error setting Gaia path: " + e.message);\n'
+    '}\n'
+    '\n'
+    '#include "{wbpp_js}"\n'
+)
 
 
 class NebulaLauncher:
@@ -23,12 +51,17 @@ class NebulaLauncher:
         self.wbpp_script_path = r"D:\Program Files\PixInsight\src\scripts\WeightedBatchPreprocessing\WeightedBatchPreprocessing.js"
         # WBPP settings template (user's saved XPSM)
         self.xpsm_template_path = Path(__file__).parent.parent.parent / "WBPP_SETTINGS.xpsm"
+        # Debug log handle, opened lazily on first log() and kept open so
+        # each message is a buffered write instead of an open/write/close.
+        self._log_fh = None
 
     def log(self, msg):
         try:
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"[{timestamp}] {msg}\n")
+            if self._log_fh is None:
+                self._log_fh = open(self.log_file, "a", encoding="utf-8", buffering=8192)
+                atexit.register(self._log_fh.close)
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self._log_fh.write(f"[{timestamp}] {msg}\n")
         except Exception as e:
             print(f"Logging failed: {e}")
 
@@ -57,8 +90,12 @@ class NebulaLauncher:
             table = instance.find('table[@id="parameters"]')
 
         if table is not None:
-            for row in (table.findall('xpsm:tr', ns) or table.findall('tr')):
-                tds = row.findall('xpsm:td', ns) or row.findall('td')
+            # Detect the namespace once from the table tag instead of probing
+            # both namespaced and bare forms for every row/cell.
+            use_ns = table.tag.startswith('{')
+            rows = table.findall('xpsm:tr', ns) if use_ns else table.findall('tr')
+            for row in rows:
+                tds = row.findall('xpsm:td', ns) if use_ns else row.findall('td')
                 if len(tds) >= 2:
                     key = tds[0].text or ""
                     value = tds[1].text or ""
@@ -109,10 +146,15 @@ class NebulaLauncher:
         
         dark_path = calibration_files.get("cal_dark", "")
         bias_path = calibration_files.get("cal_bias", "")
-        
+
         self.log(f"Calibration: dark={dark_path}, bias={bias_path}")
         self.log(f"Calibration flats: {flat_map}")
-        
+
+        # Resolve all calibration path existence checks up front with one
+        # directory listing per parent dir instead of one stat per file.
+        cal_paths = {p for p in (bias_path, dark_path, *flat_map.values()) if p}
+        exists_map = self._batch_exists(cal_paths)
+
         # --- Update calibration groups ---
         updated_groups = []
         skipped_groups = []  # Track skipped groups for summary
@@ -121,7 +163,7 @@ class NebulaLauncher:
             
             if img_type == 0:  # BIAS
                 if bias_path:
-                    if os.path.exists(bias_path):
+                    if exists_map.get(bias_path, False):
                         self._update_master_path(g, bias_path)
                         updated_groups.append(g)
                         self.log(f"  Updated BIAS group -> {bias_path}")
@@ -133,7 +175,7 @@ class NebulaLauncher:
                     
             elif img_type == 1:  # DARK
                 if dark_path:
-                    if os.path.exists(dark_path):
+                    if exists_map.get(dark_path, False):
                         self._update_master_path(g, dark_path)
                         updated_groups.append(g)
                         self.log(f"  Updated DARK group -> {dark_path}")
@@ -147,7 +189,7 @@ class NebulaLauncher:
                 filt = g.get("filter", "")
                 if filt in flat_map:
                     flat_path = flat_map[filt]
-                    if os.path.exists(flat_path):
+                    if exists_map.get(flat_path, False):
                         self._update_master_path(g, flat_path)
                         updated_groups.append(g)
                         self.log(f"  Updated FLAT group (filter={filt}) -> {flat_path}")
@@ -186,6 +228,31 @@ class NebulaLauncher:
         params["groups"] = base64.b64encode(groups_json_str.encode("utf-8")).decode("ascii")
         self.log(f"Rebuilt groups: {len(updated_groups)} total groups")
     
+    @staticmethod
+    def _batch_exists(paths):
+        """Check many paths for existence with one scandir per parent directory.
+
+        Paths sharing a parent are resolved from a single directory listing,
+        so N per-file stats collapse into one listing per directory.
+        Names are compared through os.path.normcase to keep the Windows
+        case-insensitive semantics of the os.path.exists calls this replaces.
+        Returns {path: bool}.
+        """
+        by_dir = {}
+        for p in paths:
+            by_dir.setdefault(os.path.dirname(p), []).append(p)
+
+        exists_map = {}
+        for dir_path, dir_paths in by_dir.items():
+            try:
+                with os.scandir(dir_path or ".") as it:
+                    names = {os.path.normcase(e.name) for e in it}
+            except OSError:
+                names = set()
+            for p in dir_paths:
+                exists_map[p] = os.path.normcase(os.path.basename(p)) in names
+        return exists_map
+
     def _update_master_path(self, group, new_path):
         """Update the file path of a calibration master group and clear stale sidecar files."""
         js_path = _to_js_path(new_path)
@@ -242,11 +309,50 @@ class NebulaLauncher:
         if fixed:
             self.log(f"  Fixed {len(fixed)} boolean params (false→''): {', '.join(fixed)}")
 
+    # Constant skeleton of a LIGHT group. Only "filter", "fileItems" and "id"
+    # vary per filter, so _build_light_group copies this template and patches
+    # those three keys instead of rebuilding the ~30-key dict each time.
+    # Treated as immutable: groups are serialized straight to JSON, never
+    # mutated after construction, so a shallow copy is safe.
+    _LIGHT_GROUP_TEMPLATE = {
+        "imageType": 3,  # LIGHT
+        "binning": 1,
+        "hasMaster": False,
+        "exposureTime": 300,
+        "exposureTimes": [300],
+        "optimizeMasterDark": False,
+        "size": {"width": 0, "height": 0},
+        "isCFA": False,
+        "CFAPattern": 0,
+        "debayerMethod": 2,
+        "separateCFAFlatScalingFactors": False,
+        "keywords": {},
+        "mode": 1,  # PRE - for calibration
+        "lightOutputPedestalMode": 1,
+        "lightOutputPedestal": 0,
+        "lightOutputPedestalLimit": 0.0001,
+        "drizzleData": {
+            "enabled": False,
+            "scale": 1,
+            "dropShrink": 0.9,
+            "function": 0,
+            "gridSize": 16
+        },
+        "isHidden": False,
+        "isActive": True,
+        "CCTemplate": "",
+        "footerLengthForCurrentHeader": 0,
+        "masterFiles": {},
+        "forceNoDark": False,
+        "forceNoFlat": False,
+        "__counter__": 1
+    }
+
     def _build_light_group(self, filter_name, files):
         """
         Build a minimal LIGHT group for WBPP from a list of file paths.
-        
-        WBPP uses mode=1 (PRE) for calibration processing groups and 
+
+        WBPP uses mode=1 (PRE) for calibration processing groups and
         mode=2 (POST) for post-calibration groups. A single set of light
         files appears in BOTH a PRE group (for calibration) and a POST
         group (for registration/integration). We only need the PRE group
@@ -286,42 +392,12 @@ class NebulaLauncher:
                 "isReference": {"default": False}
             })
         
-        return {
-            "imageType": 3,  # LIGHT
-            "binning": 1,
-            "hasMaster": False,
-            "exposureTime": 300,
-            "filter": filter_name.lower(),
-            "exposureTimes": [300],
-            "optimizeMasterDark": False,
-            "size": {"width": 0, "height": 0},
-            "isCFA": False,
-            "CFAPattern": 0,
-            "debayerMethod": 2,
-            "separateCFAFlatScalingFactors": False,
-            "keywords": {},
-            "mode": 1,  # PRE - for calibration
-            "fileItems": file_items,
-            "lightOutputPedestalMode": 1,
-            "lightOutputPedestal": 0,
-            "lightOutputPedestalLimit": 0.0001,
-            "drizzleData": {
-                "enabled": False,
-                "scale": 1,
-                "dropShrink": 0.9,
-                "function": 0,
-                "gridSize": 16
-            },
-            "isHidden": False,
-            "isActive": True,
-            "CCTemplate": "",
-            "footerLengthForCurrentHeader": 0,
-            "masterFiles": {},
-            "forceNoDark": False,
-            "forceNoFlat": False,
-            "id": f"3_1_{filter_name.lower()}_300_mono__1_none_0x0",
-            "__counter__": 1
-        }
+        f = filter_name.lower()
+        group = self._LIGHT_GROUP_TEMPLATE.copy()
+        group["filter"] = f
+        group["fileItems"] = file_items
+        group["id"] = f"3_1_{f}_300_mono__1_none_0x0"
+        return group
 
     # ----------------------------------------------------------------
     # JSON testFile generation
@@ -351,10 +427,8 @@ class NebulaLauncher:
         params["outputDirectory"] = _to_js_path(output_dir)
 
         # Clear stale references
-        if "referenceImage" in params:
-            del params["referenceImage"]
-        if "bestFrameReferenceKeyword" in params:
-            del params["bestFrameReferenceKeyword"]
+        params.pop("referenceImage", None)
+        params.pop("bestFrameReferenceKeyword", None)
         
         # Force auto reference method (0 = Auto) since we removed the manual reference
         params["bestFrameReferenceMethod"] = "0"
@@ -457,27 +531,14 @@ class NebulaLauncher:
         # --- Create a runner script to force PI to exit after completion ---
         # This is necessary because PI doesn't automatically exit after running
         # a script via -r, which prevents NebulaPilot from detecting completion.
+        # Note: CoreApplication.quit() is no longer a function in recent
+        # PixInsight versions. When launched with --automation-mode,
+        # PixInsight will automatically exit once the script finishes.
         runner_file = test_file.with_suffix(".runner.js")
         with open(runner_file, "w", encoding="utf-8") as f:
-            # Configure Gaia DR3 database path (USER PROVIDED)
-            gaia_path = r"D:/Program Files/PixInsight/library/gaia"
-            f.write(f'// Configure Gaia DR3 Database Path\n')
-            f.write(f'try {{\n')
-            f.write(f'   if (File.directoryExists("{gaia_path}")) {{\n')
-            f.write(f'      Settings.write("StarCatalogs/Gaia/DR3/DatabaseFilePaths", ["{gaia_path}"]);\n')
-            f.write(f'      console.writeln("nebulaPilot: Configured Gaia DR3 path: {gaia_path}");\n')
-            f.write(f'   }} else {{\n')
-            f.write(f'      console.warningln("nebulaPilot: Gaia path not found: {gaia_path}");\n')
-            f.write(f'   }}\n')
-            f.write(f'}} catch (e) {{\n')
-            f.write(f'   console.criticalln("nebulaPilot: Error setting Gaia path: " + e.message);\n')
-            f.write(f'}}\n\n')
-
-            f.write(f'#include "{wbpp_js}"\n')
-            # Note: CoreApplication.quit() is no longer a function in recent PixInsight versions.
-            # When launched with --automation-mode, PixInsight will automatically exit
-            # once the script execution finishes.
-            
+            f.write(_RUNNER_TEMPLATE.replace("{wbpp_js}", wbpp_js))
+
+
         runner_js = _to_js_path(runner_file)
 
         r_parts = [
@@ -489,10 +550,11 @@ class NebulaLauncher:
 
         r_value = ",".join(r_parts)
 
-        # Build shell command
-        cmd_str = f'"{self.pi_path}" -n --automation-mode -r="{r_value}"'
+        # Build the command as an argv list — no shell, no cmd.exe parent
+        # process, and no quoting issues if target names contain spaces/quotes.
+        cmd = [self.pi_path, "-n", "--automation-mode", f"-r={r_value}"]
 
-        self.log(f"Command: {cmd_str}")
+        self.log(f"Command: {cmd}")
         print(f"Launching WBPP for {target_name}: {total_files} light frames")
         print(f"Output: {pi_out}")
 
@@ -503,7 +565,7 @@ class NebulaLauncher:
             return False, [], None
 
         try:
-            proc = subprocess.Popen(cmd_str, shell=True)
+            proc = subprocess.Popen(cmd)
             self.log(f"Popen started, PID: {proc.pid}")
             return proc, [test_file, runner_file], pi_out
         except Exception as e:
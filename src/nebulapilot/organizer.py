@@ -1,74 +1,105 @@
 
+import csv
+import json
 import os
+import re
 import shutil
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
-from astropy.io import fits
-from .scanner import get_fits_metadata
 
-import re
+import numpy as np
+
+from .db import init_db, add_targets_bulk, add_frames_bulk, load_header_cache, save_header_cache, prune_header_cache
+from .quality_check import ImageQualityAnalyzer, _fast_median
+from .scanner import get_fits_metadata, _iter_fits
+
+# Filesystem-safe target names: one translate pass instead of two chained
+# replace calls, applied once per file and cached as metadata["_target_key"].
+_TARGET_KEY_TABLE = str.maketrans({" ": "_", "/": "-"})
+
+# Regex for YYYY-MM-DD, YYYYMMDD, YYYY_MM_DD (simple validation)
+# Matches years 20xx or 19xx. Compiled once: this runs per discovered file.
+_DATE_RE = re.compile(r'^(19|20)\d{2}[-_\.]?(0[1-9]|1[0-2])[-_\.]?(0[1-9]|[12]\d|3[01])$')
+
+@lru_cache(maxsize=4096)
+def _date_part_index(parts):
+    """Index of the first date-like component in a parts tuple, else None."""
+    for i, part in enumerate(parts):
+        # Cheap prefilter: a date part is 8-10 chars and starts with 19/20.
+        # This rejects the vast majority of components before any regex work.
+        if not 8 <= len(part) <= 10 or part[:2] not in ('19', '20'):
+            continue
+        if _DATE_RE.match(part):
+            return i
+    return None
 
 def get_path_from_date_folder(file_path):
     """
     Try to find a date-like folder in the path and return the relative path starting from there.
     Supports YYYY-MM-DD, YYYYMMDD, YYYY_MM_DD.
+
+    Every file in a directory shares its ancestor components, so the
+    date-folder search is cached on the parent parts tuple — one regex walk
+    per directory instead of one per file.
     """
-    parts = list(file_path.parts)
-    # Regex for YYYY-MM-DD, YYYYMMDD, YYYY_MM_DD (simple validation)
-    # Matches years 20xx or 19xx
-    date_pattern = re.compile(r'^(19|20)\d{2}[-_\.]?(0[1-9]|1[0-2])[-_\.]?(0[1-9]|[12]\d|3[01])$')
-    
-    for i, part in enumerate(parts):
-        if date_pattern.match(part):
-            # Found the date folder. Return path starting from this part.
-            return Path(*parts[i:])
-            
+    parts = file_path.parts  # already a tuple; no need to copy to a list
+    i = _date_part_index(parts[:-1])
+    if i is not None:
+        # Found the date folder. Return path starting from this part.
+        return Path(*parts[i:])
+
     return None
 
-def is_frame_good(header):
+def is_frame_good(metadata):
     """
-    Check if a frame is good enough to be kept.
+    Check if a frame is good enough to be kept, based on the metadata dict
+    already parsed by scanner.get_fits_metadata — no second FITS open needed.
     Currently returns True for all valid FITS files.
     """
     # Example logic:
-    # if header.get("EXPTIME", 0) < 60:
+    # if metadata.get("exptime_sec", 0) < 60:
     #     return False
     return True
 
-def get_organize_path(metadata, dest_root, source_root, is_good):
+def get_organize_path(metadata, dest_root, source_root, is_good, file_path=None):
     """
     Determine the destination path for a file based on its metadata.
     Preserves directory structure starting from the Date folder downwards.
+
+    Callers iterating many files should pass a pre-built Path as dest_root
+    and the file's Path as file_path so this stays cheap in the hot loop.
     """
-    file_path = Path(metadata["path"])
-    
+    if file_path is None:
+        file_path = Path(metadata["path"])
+    if not isinstance(dest_root, Path):
+        dest_root = Path(dest_root)
+
     # Determine the structural part of the path we want to keep
     # Strategy: "Date Downwards"
     rel_path = get_path_from_date_folder(file_path)
-    
+
     if rel_path is None:
         # Fallback: If no date folder found, try relative to source_root, else just filename
         try:
             rel_path = file_path.relative_to(source_root)
         except ValueError:
-            rel_path = Path(file_path.name)
+            rel_path = file_path.name
+
+    # Standardize Target Name BEFORE determining destination (cached by the
+    # organizer; fall back to computing it for external callers)
+    target_name = metadata.get("_target_key")
+    if target_name is None:
+        target_name = metadata.get("target_name", "Unknown").translate(_TARGET_KEY_TABLE)
 
-    # Standardize Target Name BEFORE determining destination
-    target_name = metadata.get("target_name", "Unknown").replace(" ", "_").replace("/", "-")
-            
     if not is_good:
         # Failed frames: Root / failed / Target / RelPath
-        return Path(dest_root) / "failed" / target_name / rel_path
-    
-    # Good frames: Root / Target / RelPath
-    return Path(dest_root) / target_name / rel_path
-
+        return dest_root.joinpath("failed", target_name, rel_path)
 
-from datetime import datetime
-from .db import init_db, add_target, add_frame
-from .quality_check import ImageQualityAnalyzer
-import csv
-import numpy as np
+    # Good frames: Root / Target / RelPath
+    return dest_root.joinpath(target_name, rel_path)
 
 def write_log_file(folder_path, log_records, group_reference=None):
     """
@@ -81,37 +112,42 @@ def write_log_file(folder_path, log_records, group_reference=None):
     
     # Check if file exists to write header
     file_exists = log_file.exists()
-    
-    with open(log_file, 'a', newline='') as f:
+
+    # Values shared by every row of this batch: one timestamp (all rows are
+    # written within milliseconds of each other) and the group reference.
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    ref_stars = ""
+    ref_fwhm = ""
+    if group_reference:
+        ref_stars = group_reference.get("star_count", "")
+        # group_reference["fwhm"] might be float
+        ref_fwhm = f"{group_reference.get('fwhm', 0):.2f}"
+
+    rows = []
+    for record in log_records:
+        metrics = record.get("metrics", {})
+        rows.append([
+            timestamp,
+            Path(record["path"]).name,
+            record["decision"],
+            record["reason"],
+            metrics.get("star_count", ""),
+            f"{metrics.get('fwhm', 0):.2f}",
+            f"{metrics.get('ellipticity', 0):.2f}",
+            f"{metrics.get('bg_mean', 0):.2f}",
+            f"{metrics.get('bg_rms', 0):.2f}",
+            ref_stars,
+            ref_fwhm
+        ])
+
+    with open(log_file, 'a', newline='', buffering=1 << 20) as f:
         writer = csv.writer(f)
         if not file_exists:
             # Add Reference Info to Header if available
             header = ["Timestamp", "Filename", "Decision", "Reason", "StarCount", "FWHM", "Ellipticity", "BgMean", "BgRMS", "Ref_Stars", "Ref_FWHM"]
             writer.writerow(header)
-        
-        for record in log_records:
-            metrics = record.get("metrics", {})
-            
-            ref_stars = ""
-            ref_fwhm = ""
-            if group_reference:
-                ref_stars = group_reference.get("star_count", "")
-                # group_reference["fwhm"] might be float
-                ref_fwhm = f"{group_reference.get('fwhm', 0):.2f}"
-
-            writer.writerow([
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                Path(record["path"]).name,
-                record["decision"],
-                record["reason"],
-                metrics.get("star_count", ""),
-                f"{metrics.get('fwhm', 0):.2f}",
-                f"{metrics.get('ellipticity', 0):.2f}",
-                f"{metrics.get('bg_mean', 0):.2f}",
-                f"{metrics.get('bg_rms', 0):.2f}",
-                ref_stars,
-                ref_fwhm
-            ])
+
+        writer.writerows(rows)
 
 def calculate_group_reference(records):
     """
@@ -120,26 +156,35 @@ def calculate_group_reference(records):
     """
     if not records:
         return None
-        
-    # Extract metrics lists - ensure we only pull from records that actually have valid metrics
-    star_counts = [r["metrics"]["star_count"] for r in records if r.get("metrics") and "star_count" in r["metrics"]]
-    fwhms = [r["metrics"]["fwhm"] for r in records if r.get("metrics") and r["metrics"].get("fwhm", 0) > 0]
-    
-    if not star_counts:
+
+    # Collect metrics straight into NumPy arrays - ensure we only pull from
+    # records that actually have valid metrics
+    star_counts = np.fromiter(
+        (r["metrics"]["star_count"] for r in records if r.get("metrics") and "star_count" in r["metrics"]),
+        dtype=np.float64
+    )
+    fwhms = np.fromiter(
+        (r["metrics"]["fwhm"] for r in records if r.get("metrics") and r["metrics"].get("fwhm", 0) > 0),
+        dtype=np.float64
+    )
+
+    if star_counts.size == 0:
         return None
-        
-    # Reference Star Count: 
-    # Use 90th percentile (robust maximum) to avoid outliers but pick a "good" frame standard.
-    # If very few frames, max is fine.
-    ref_stars = float(np.percentile(star_counts, 90))
-    
+
+    # Reference Star Count:
+    # Use 90th percentile (robust maximum) to avoid outliers but pick a "good"
+    # frame standard. Selected via O(n) np.partition rather than a full sort;
+    # the exact order statistic is plenty for a heuristic reference.
+    k = int(0.9 * (star_counts.size - 1))
+    ref_stars = float(np.partition(star_counts, k)[k])
+
     # Reference FWHM:
     # Median is usually best for FWHM to ignore bad tracking/wind outliers.
-    if fwhms:
-        ref_fwhm = float(np.median(fwhms))
+    if fwhms.size:
+        ref_fwhm = float(_fast_median(fwhms))
     else:
         ref_fwhm = 12.0 # Default fallback
-        
+
     return {
         "star_count": ref_stars,
         "fwhm": ref_fwhm
@@ -179,6 +224,77 @@ def evaluate_relative(record, reference):
         
     return "ACCEPT", "Relative Pass"
 
+def evaluate_group_relative(records, reference):
+    """
+    Vectorized evaluate_relative over a whole group.
+
+    Applies the same thresholds in the same priority order, but as three
+    NumPy comparisons across the group instead of per-record dict lookups,
+    and only formats reason strings for the (rare) rejects.
+    Returns a list of (Decision, Reason) tuples aligned with records.
+    """
+    min_star_ratio = 0.3
+    max_fwhm_ratio = 1.6
+
+    # Records without metrics (analysis failed) keep their initial decision.
+    results = [
+        (r.get("initial_decision", "REJECT"),
+         r.get("initial_reason", "Analysis failed / missing metrics"))
+        for r in records
+    ]
+    idx = [i for i, r in enumerate(records)
+           if r.get("metrics") and "star_count" in r["metrics"]]
+    if not idx:
+        return results
+
+    stars = np.fromiter(
+        (records[i]["metrics"]["star_count"] for i in idx),
+        dtype=np.float64, count=len(idx)
+    )
+    fwhms = np.fromiter(
+        (records[i]["metrics"].get("fwhm", 0) for i in idx),
+        dtype=np.float64, count=len(idx)
+    )
+
+    # Decision codes, written in reverse priority so earlier (more severe)
+    # checks overwrite later ones: 0=accept, 1=absolute min, 2=star ratio, 3=FWHM
+    codes = np.zeros(len(idx), dtype=np.int8)
+    if reference["fwhm"] > 0:
+        codes[fwhms > reference["fwhm"] * max_fwhm_ratio] = 3
+    codes[stars < reference["star_count"] * min_star_ratio] = 2
+    codes[stars < 5] = 1
+
+    for j, i in enumerate(idx):
+        code = codes[j]
+        if code == 0:
+            results[i] = ("ACCEPT", "Relative Pass")
+        elif code == 1:
+            results[i] = ("REJECT", "Start Count < 5 (Absolute Minimum)")
+        elif code == 2:
+            metrics = records[i]["metrics"]
+            results[i] = ("REJECT", f"Star Count {metrics['star_count']} < {min_star_ratio:.0%} of Ref ({reference['star_count']:.1f})")
+        else:
+            metrics = records[i]["metrics"]
+            results[i] = ("REJECT", f"FWHM {metrics['fwhm']:.2f} > {max_fwhm_ratio}x Ref ({reference['fwhm']:.2f})")
+    return results
+
+# Per-process analyzer for the Pass-1 worker pool, created lazily so each
+# worker builds its ImageQualityAnalyzer once rather than once per frame.
+_worker_analyzer = None
+
+def _analyze_worker(file_path):
+    """Analyze one frame in a pool worker; returns (result_dict, error_str)."""
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        _worker_analyzer = ImageQualityAnalyzer()
+    try:
+        return _worker_analyzer.analyze_image(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+
+
 def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=None, structure_callback=None, channel_callback=None, is_cancelled=None):
     """
     Scans source_dir for FITS files, organizes them into dest_dir/Target/Date/Filter.
@@ -197,10 +313,11 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
         print(f"Source directory {source_dir} does not exist.")
         return None
 
+    if not dry_run:
+        dest_path.mkdir(parents=True, exist_ok=True)
+
     print(f"Scanning {source_dir}...")
-    
-    analyzer = ImageQualityAnalyzer()
-    
+
     # Initialize Statistics early to avoid NameError if cancelled
     stats = {
         "total_files": 0,
@@ -210,14 +327,14 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
     }
     
     # --- Pass 0: Quick Pre-Scan (Headers only) ---
-    all_files = list(source_path.rglob("*.fit*"))
+    all_files = list(_iter_fits(source_path))
     total_files = len(all_files)
     
     # Key: (TargetName, FilterName) -> List of records (metadata only initially)
-    groups = {} 
-    
+    groups = defaultdict(list)
+
     # Structure for GUI: {target: {filter: count}}
-    gui_structure = {}
+    gui_structure = defaultdict(lambda: defaultdict(int))
     
     # Files ready for analysis
     pending_records_for_analysis = [] # List of references to record dicts in 'groups'
@@ -230,29 +347,54 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
         print("No files found. Proceeding to cleanup.")
     else:
         # 1. Pre-Scan Headers (Fast)
+        # Header reads are I/O-bound, so overlap the disk latency with a
+        # thread pool. Grouping and DB work stay on the main thread.
         if progress_callback: progress_callback(0, "Scanning headers...")
-        
-        for i, file_path in enumerate(all_files):
-            if is_cancelled and is_cancelled(): 
-                print("Operation cancelled during header scan.")
-                return stats
-            if not file_path.is_file():
-                continue
-            
+
+        # Persistent header cache: headers of unchanged files (same mtime
+        # and size) are served from the DB without touching the FITS at all.
+        header_cache = load_header_cache()
+        new_cache_entries = []  # list.append is thread-safe under the GIL
+
+        def _read_header(file_path):
             try:
+                st = os.stat(file_path)
+                path_str = str(file_path)
+                cached = header_cache.get(path_str)
+                if cached and cached[0] == st.st_mtime and cached[1] == st.st_size:
+                    return json.loads(cached[2]), None
                 metadata = get_fits_metadata(file_path)
+                if metadata:
+                    new_cache_entries.append(
+                        (path_str, st.st_mtime, st.st_size, json.dumps(metadata))
+                    )
+                return metadata, None
+            except Exception as e:
+                return None, e
+
+        max_workers = min(32, (os.cpu_count() or 4) * 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for i, (file_path, (metadata, error)) in enumerate(
+                zip(all_files, executor.map(_read_header, all_files))
+            ):
+                if is_cancelled and is_cancelled():
+                    print("Operation cancelled during header scan.")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return stats
+
+                if error is not None:
+                    print(f"Error reading header {file_path}: {error}")
+                    continue
                 if not metadata:
                     print(f"Skipping {file_path}: Metadata error")
                     continue
-                    
-                target = metadata.get("target_name", "Unknown").replace(" ", "_").replace("/", "-")
+
+                target = metadata.get("target_name", "Unknown").translate(_TARGET_KEY_TABLE)
+                metadata["_target_key"] = target
                 filter_name = metadata.get("filter", "Unknown")
-                
+
                 group_key = (target, filter_name)
-                
-                if group_key not in groups:
-                    groups[group_key] = []
-                
+
                 # Init record with just metadata for now
                 record = {
                     "file_path": file_path,
@@ -260,22 +402,20 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
                     # metrics/decision will be filled later
                 }
                 groups[group_key].append(record)
-                
+
                 # Update GUI structure
-                if target not in gui_structure:
-                    gui_structure[target] = {}
-                gui_structure[target][filter_name] = gui_structure[target].get(filter_name, 0) + 1
-                
+                gui_structure[target][filter_name] += 1
+
                 pending_records_for_analysis.append(record) # Store reference to the record
                 valid_files_count += 1
-                
+
                 # Optional: Update progress for scan phase (0-10%)
                 if progress_callback and i % 10 == 0:
                      percent = int((i / total_files) * 10)
                      progress_callback(percent, f"Scanning headers ({i}/{total_files})...")
 
-            except Exception as e:
-                print(f"Error reading header {file_path}: {e}")
+        # Persist freshly parsed headers for the next run
+        save_header_cache(new_cache_entries)
 
         # Emit Structure to GUI
         if structure_callback:
@@ -288,56 +428,83 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
         channel_progress = {} # (target, filter) -> count
         
         total_pending = len(pending_records_for_analysis)
-        
-        for i, record in enumerate(pending_records_for_analysis):
-            if is_cancelled and is_cancelled():
-                print("Operation cancelled during image analysis.")
-                return stats
-            file_path = record["file_path"]
-            metadata = record["metadata"]
-            
-            # Update Main Progress (10-50%)
-            percent = 10 + int((i / total_pending) * 40)
-            status_msg = f"Analyzing {file_path.name}..."
-            if progress_callback:
-                progress_callback(percent, status_msg)
-            
-            print(f"Analyzing {file_path.name}...")
+        next_report = 0
+        channel_step = max(1, total_pending // 100)
+
+        # Star detection is CPU-bound, so farm frames out to a process pool.
+        # Each worker keeps a single ImageQualityAnalyzer; records are filled
+        # in on the main thread as results stream back in submission order.
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            results = pool.map(
+                _analyze_worker,
+                [record["file_path"] for record in pending_records_for_analysis],
+                chunksize=4,
+            )
+            for i, (record, (analysis_result, error)) in enumerate(
+                zip(pending_records_for_analysis, results)
+            ):
+                if is_cancelled and is_cancelled():
+                    print("Operation cancelled during image analysis.")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    return stats
+                file_path = record["file_path"]
+                metadata = record["metadata"]
+
+                # Update Main Progress (10-50%), throttled: per-file callbacks
+                # swamp the GUI event loop on large runs, so cap at ~100
+                # updates over the pass.
+                if progress_callback and i >= next_report:
+                    percent = 10 + int((i / total_pending) * 40)
+                    progress_callback(percent, f"Analyzing {file_path.name}...")
+                    next_report = i + max(1, total_pending // 100)
+
+                print(f"Analyzing {file_path.name}...")
+
+                if error is not None:
+                    print(f"Analysis failed for {file_path}: {error}")
+                    # Mark as rejected if analysis fails
+                    record["metrics"] = {} # Empty metrics
+                    record["initial_decision"] = "REJECT"
+                    record["initial_reason"] = f"Analysis failed: {error}"
+                    total_rejected += 1
+                else:
+                    # Update the record with analysis results
+                    record["metrics"] = analysis_result["metrics"]
+                    record["initial_decision"] = analysis_result["decision"]
+                    record["initial_reason"] = analysis_result["reason"]
+
+                # Update Channel Progress
+                target = metadata["_target_key"]
+                filter_name = metadata.get("filter", "Unknown")
+                key = (target, filter_name)
+                channel_progress[key] = channel_progress.get(key, 0) + 1
+
+                # Same throttling for the per-channel bars
+                if channel_callback and channel_progress[key] % channel_step == 0:
+                    channel_callback(target, filter_name, channel_progress[key])
+
+        # Final sync so every channel bar shows its true count
+        if channel_callback:
+            for (target, filter_name), count in channel_progress.items():
+                channel_callback(target, filter_name, count)
 
-            try:
-                # Perform Analysis
-                analysis_result = analyzer.analyze_image(file_path)
-                
-                # Update the record with analysis results
-                record["metrics"] = analysis_result["metrics"]
-                record["initial_decision"] = analysis_result["decision"]
-                record["initial_reason"] = analysis_result["reason"]
-                
-            except Exception as e:
-                print(f"Analysis failed for {file_path}: {e}")
-                # Mark as rejected if analysis fails
-                record["metrics"] = {} # Empty metrics
-                record["initial_decision"] = "REJECT"
-                record["initial_reason"] = f"Analysis failed: {e}"
-                total_rejected += 1
-                
-            # Update Channel Progress
-            target = metadata.get("target_name", "Unknown").replace(" ", "_").replace("/", "-")
-            filter_name = metadata.get("filter", "Unknown")
-            key = (target, filter_name)
-            channel_progress[key] = channel_progress.get(key, 0) + 1
-            
-            if channel_callback:
-                channel_callback(target, filter_name, channel_progress[key])
-                
     # Update total files count in stats
     stats["total_files"] = valid_files_count
 
     # --- Pass 2: Calculate Reference and Evaluate ---
-    
+
     # Store logs to write later
     logs_to_write = {}
 
+    # Accumulate DB rows and flush them in one transaction at the end
+    # instead of committing per file.
+    pending_targets = set()
+    pending_frames = []
+
+    # Destination dirs already ensured this run — most files in a group land
+    # in the same folder, so skip the repeated mkdir(exist_ok=True) stats.
+    created_dirs = set()
+
     total_groups = len(groups)
     current_group_idx = 0
 
@@ -365,16 +532,14 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
         else:
             print(f"  -> Reference: Stars={reference['star_count']:.1f}, FWHM={reference['fwhm']:.2f}")
 
-        # 2. Re-Evaluate each file
-        for record in records:
-            # Decide
-            if reference:
-                decision, reason = evaluate_relative(record, reference)
-            else:
-                # Fallback to initial decision (Absolute Thresholds)
-                decision = record["initial_decision"]
-                reason = record["initial_reason"]
-            
+        # 2. Re-Evaluate the whole group in one vectorized pass
+        if reference:
+            decisions = evaluate_group_relative(records, reference)
+        else:
+            # Fallback to initial decisions (Absolute Thresholds)
+            decisions = [(r["initial_decision"], r["initial_reason"]) for r in records]
+
+        for record, (decision, reason) in zip(records, decisions):
             is_good = (decision == "ACCEPT")
             
             # 3. Determine Paths
@@ -382,7 +547,7 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
             metadata = record["metadata"]
             
             # Destination path logic
-            dest_file_path = get_organize_path(metadata, dest_dir, source_dir, is_good)
+            dest_file_path = get_organize_path(metadata, dest_path, source_path, is_good, file_path=source_file)
             
             # 4. Prepare Log Record
             log_entry = {
@@ -420,9 +585,18 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
             if dry_run:
                 print(f"[DRY RUN] {decision}: {source_file.name} -> {dest_file_path} [{reason}]")
             else:
-                dest_file_path.parent.mkdir(parents=True, exist_ok=True)
-                # Use shutil.move for final production (clears source)
-                shutil.move(str(source_file), str(dest_file_path))
+                dest_parent = dest_file_path.parent
+                if dest_parent not in created_dirs:
+                    dest_parent.mkdir(parents=True, exist_ok=True)
+                    created_dirs.add(dest_parent)
+                # Move (clears source). os.replace is a single atomic syscall
+                # on the same filesystem; cross-device moves raise OSError
+                # (EXDEV) and fall back to shutil.move's copy path, which
+                # also covers mount points nested inside the tree.
+                try:
+                    os.replace(source_file, dest_file_path)
+                except OSError:
+                    shutil.move(str(source_file), str(dest_file_path))
                 print(f"Moved {source_file.name} -> {dest_file_path} [{decision}]")
                 
                 # Update Statistics
@@ -436,8 +610,16 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
                 # If we fill DB with bad files, it might mess up stats.
                 if is_good:
                     metadata["path"] = str(dest_file_path)
-                    add_target(metadata["target_name"])
-                    add_frame(metadata)
+                    pending_targets.add(metadata["target_name"])
+                    pending_frames.append(metadata)
+
+    # --- Flush DB updates (one transaction per table) ---
+    if not dry_run:
+        add_targets_bulk(pending_targets)
+        add_frames_bulk(pending_frames)
+        # The moves above just orphaned this run's header-cache rows, so
+        # evict anything that no longer exists on disk.
+        prune_header_cache()
 
     # --- Write Logs ---
     if not dry_run:
@@ -445,13 +627,6 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
         for folder, data in logs_to_write.items():
             write_log_file(folder, data["records"], group_reference=None)
 
-    # Clean up empty source directories after moving files
-    if not dry_run:
-        print("Cleaning up empty source directories...")
-        
-        # Define junk files that can be safely deleted if they are the only things left
-        IGNORED_FILES = {'.DS_Store', 'Thumbs.db', 'desktop.ini'}
-
     # Clean up empty source directories after moving files
     if not dry_run:
         print("Cleaning up empty source directories...")
@@ -463,21 +638,19 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
             """
             Check if a directory is empty or contains only ignored system files.
             Returns True if it's safe to delete (effectively empty).
+
+            Uses os.scandir so entry types come from the directory read
+            itself (no stat per entry) and short-circuits on the first
+            subdirectory or non-junk file.
             """
             try:
-                # List all items
-                items = list(path.iterdir())
-                # If completely empty
-                if not items:
-                    return True
-                
-                # Check if all items are files and are in the ignore list
-                for item in items:
-                    if item.is_dir():
-                        return False # Contains a subdirectory, so not empty yet
-                    if item.name not in IGNORED_FILES:
-                        return False # Contains a non-junk file
-                return True # Contains only junk files
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            return False # Contains a subdirectory, so not empty yet
+                        if entry.name not in IGNORED_FILES:
+                            return False # Contains a non-junk file
+                return True # Empty, or contains only junk files
             except Exception:
                 return False
 
@@ -498,29 +671,28 @@ def organize_directory(source_dir, dest_dir, dry_run=False, progress_callback=No
                 pass
 
 
-        # Run multiple passes to handle nested directory removal reliably
-        # Sometimes deleting a child makes the parent empty, but os.walk order might miss it if structure is complex
-        for _ in range(3):
-            deleted_any = False
-            # Use os.walk with topdown=False to delete children before parents
-            for root, dirs, files in os.walk(source_dir, topdown=False):
-                if is_cancelled and is_cancelled():
-                    return stats
-                for name in dirs:
-                    dir_to_check = Path(root) / name
-                    
-                    if is_directory_effectively_empty(dir_to_check):
-                        try:
-                            # Use rmtree to force delete even if read-only files inside
-                            # This handles stubborn "Access Denied" caused by attributes
-                            shutil.rmtree(dir_to_check, onerror=remove_readonly)
-                            print(f"Removed empty directory: {dir_to_check}")
-                            deleted_any = True
-                        except Exception as e:
-                            print(f"Failed to remove {dir_to_check}: {e}")
-            
-            if not deleted_any:
-                break # No more work to do
+        # Single bottom-up pass: os.walk(topdown=False) visits children before
+        # their parents, so a directory emptied by deleting its children is
+        # itself checked afterwards — no retry passes needed. Already-deleted
+        # children are tracked so we don't re-probe them from the parent.
+        deleted_dirs = set()
+        for root, dirs, files in os.walk(source_dir, topdown=False):
+            if is_cancelled and is_cancelled():
+                return stats
+            for name in dirs:
+                dir_to_check = Path(root) / name
+                if dir_to_check in deleted_dirs:
+                    continue
+
+                if is_directory_effectively_empty(dir_to_check):
+                    try:
+                        # Use rmtree to force delete even if read-only files inside
+                        # This handles stubborn "Access Denied" caused by attributes
+                        shutil.rmtree(dir_to_check, onerror=remove_readonly)
+                        print(f"Removed empty directory: {dir_to_check}")
+                        deleted_dirs.add(dir_to_check)
+                    except Exception as e:
+                        print(f"Failed to remove {dir_to_check}: {e}")
 
     return stats
 
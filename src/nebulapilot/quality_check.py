@@ -1,5 +1,6 @@
 import os
 import sys
+from contextlib import nullcontext
 import numpy as np
 from astropy.io import fits
 import warnings
@@ -10,6 +11,37 @@ try:
 except ImportError:
     sep = None
 
+def _fast_median(a):
+    """Median of a 1-D array via np.partition (O(n)) instead of a full sort."""
+    n = a.size
+    k = n // 2
+    part = np.partition(a, k)
+    if n % 2:
+        return part[k]
+    # After partitioning at k, the (k-1)th order statistic is the max of the
+    # left half — no second partition needed.
+    return 0.5 * (part[k] + part[:k].max())
+
+def _star_stats(a, b):
+    """
+    Fused FWHM/ellipticity statistics over SEP's a/b axis arrays.
+
+    Builds the a > 0 validity mask once and computes per-star FWHM
+    (2.355 * (a + b) / 2, i.e. 1.1775 * (a + b)) and ellipticity (1 - b/a)
+    on the masked views in a single pass each, instead of masking and
+    indexing the arrays separately per metric.
+    Returns (fwhm_median, ellipticity_median, n_valid).
+    """
+    valid = a > 0
+    if not valid.all():
+        a = a[valid]
+        b = b[valid]
+    if a.size == 0:
+        return 0.0, 0.0, 0
+    fwhms = 1.1775 * (a + b)
+    ellipticities = 1.0 - b / a
+    return float(_fast_median(fwhms)), float(_fast_median(ellipticities)), int(a.size)
+
 class ImageQualityAnalyzer:
     def __init__(self, thresholds=None):
         # Default conservative thresholds (loose enough to keep okay-ish frames)
@@ -23,9 +55,15 @@ class ImageQualityAnalyzer:
         if thresholds:
             self.thresholds.update(thresholds)
 
-    def analyze_image(self, file_path):
+    def analyze_image(self, file_path, hdul=None):
         """
         Analyze a FITS file and return metrics and acceptance decision.
+
+        Callers that already hold an open HDUList (e.g. right after a
+        header read) can pass it as hdul to skip a second open/parse;
+        astropy loads HDU data lazily, so the pixel array is only read
+        here either way. A caller-supplied hdul is not closed and its
+        pixel data is left untouched.
         """
         if sep is None:
             return {
@@ -35,7 +73,9 @@ class ImageQualityAnalyzer:
             }
 
         try:
-            with fits.open(file_path) as hdul:
+            caller_owns_hdul = hdul is not None
+            ctx = nullcontext(hdul) if caller_owns_hdul else fits.open(file_path)
+            with ctx as hdul:
                 # Assuming data is in the primary HDU or first extension
                 data = hdul[0].data
                 if data is None and len(hdul) > 1:
@@ -49,12 +89,22 @@ class ImageQualityAnalyzer:
                         "path": str(file_path)
                     }
 
-                # Ensure data is native byte order (SEP requirement) and float
-                # FITS is big-endian, x86 is little-endian. .astype(float) usually handles this but
-                # explicit byteswap might be needed if strictly using buffer protocol.
-                # numpy.astype() generally returns native byte order.
-                data = data.astype(float)
-                
+                # Ensure data is native byte order (SEP requirement) and float.
+                # FITS is big-endian, x86 is little-endian; ascontiguousarray
+                # converts to a native-order contiguous array. float32 is
+                # plenty for 16-bit ADU inputs and halves the bytes moved
+                # through the background/extract/subtract pipeline vs float64.
+                raw = data
+                data = np.ascontiguousarray(data, dtype=np.float32)
+
+                # bkg.subfrom later mutates data in place. If the caller's
+                # array was already contiguous native float32, the
+                # conversion above was a no-op view — copy so a supplied
+                # HDUList keeps its pixel data intact.
+                if caller_owns_hdul and data is raw:
+                    data = data.copy()
+
+
                 # 1. Background Estimation
                 try:
                     bkg = sep.Background(data)
@@ -70,8 +120,12 @@ class ImageQualityAnalyzer:
                 bg_mean = bkg.globalback
                 bg_rms = bkg.globalrms
                 
-                # Subtract background for source detection
-                data_sub = data - bkg.back()
+                # Subtract background for source detection. subfrom works
+                # in place at the C level, so neither the background map
+                # (bkg.back()) nor a subtracted copy is ever materialized;
+                # the raw pixel values aren't needed past this point.
+                bkg.subfrom(data)
+                data_sub = data
                 
                 # 2. Source Extraction
                 # threshold = 3.0 * sigma (standard)
@@ -84,34 +138,21 @@ class ImageQualityAnalyzer:
                 fwhm_median = 0.0
                 ellipticity_median = 0.0
 
-                if star_count > 0:
+                # Frames under 5 stars are rejected on count alone by every
+                # consumer (_evaluate's min_stars and the organizer's
+                # absolute floor in evaluate_relative), so skip the metric
+                # work for them — often the majority of a bad night. Don't
+                # gate on min_stars itself: the organizer's relative pass
+                # re-accepts frames below it and still needs their FWHM.
+                if star_count >= 5:
                     # SEP 'a' and 'b' are RMS parameters (sigma)
                     # For Gaussian profile: FWHM = 2.355 * sigma
                     # We average a and b for a single FWHM value per star
                     # Note: This is an approximation. IDL/PixInsight might use different fitting.
                     # Ideally we use calculate_fwhm from photutils, but SEP is faster here.
-                    
-                    # Filter out bad values (e.g. extremely large or small)
-                    # objects['a'] and ['b'] are float32
-                    
-                    # Vectorized calculation
-                    fwhms = 2.355 * (objects['a'] + objects['b']) / 2.0
-                    
-                    # Ellipticity: 1 - b/a
-                    # Avoid division by zero
-                    a_axis = objects['a']
-                    b_axis = objects['b']
-                    # mask where a > 0
-                    valid_mask = a_axis > 0
-                    
-                    if np.any(valid_mask):
-                        fwhms = fwhms[valid_mask]
-                        # Ellipticity
-                        dl = 1.0 - (b_axis[valid_mask] / a_axis[valid_mask])
-                        
-                        if len(fwhms) > 0:
-                            fwhm_median = float(np.median(fwhms))
-                            ellipticity_median = float(np.median(dl))
+                    # _star_stats masks a > 0 (division guard) and fuses both
+                    # metric computations into one pass over the object table.
+                    fwhm_median, ellipticity_median, _ = _star_stats(objects['a'], objects['b'])
 
                 metrics = {
                     "star_count": int(star_count),
@@ -1,4 +1,5 @@
 import json
+import os
 from pathlib import Path
 
 QUEUE_FILE = Path("integration_queue.json")
@@ -6,6 +7,7 @@ QUEUE_FILE = Path("integration_queue.json")
 class QueueManager:
     def __init__(self):
         self.queue = self.load_queue()
+        self._last_saved = json.dumps(self.queue)
 
     def load_queue(self):
         if not QUEUE_FILE.exists():
@@ -17,8 +19,18 @@ class QueueManager:
             return []
 
     def save_queue(self):
-        with open(QUEUE_FILE, "w") as f:
-            json.dump(self.queue, f, indent=4)
+        # Encode once (compact — the file is machine-read only) and skip the
+        # write entirely when the queue hasn't changed; GUI drag-drop calls
+        # this on every gesture.
+        encoded = json.dumps(self.queue)
+        if encoded == self._last_saved:
+            return
+        # Write-then-rename so a crash mid-write can't leave a truncated
+        # queue file; os.replace is atomic on the same filesystem.
+        tmp = QUEUE_FILE.with_suffix(".json.tmp")
+        tmp.write_text(encoded)
+        os.replace(tmp, QUEUE_FILE)
+        self._last_saved = encoded
 
     def add_target(self, target_name):
         if target_name not in self.queue:
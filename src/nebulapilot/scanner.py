@@ -1,110 +1,202 @@
-import os
-import time
-from pathlib import Path
-from astropy.io import fits
-from .db import add_frame, add_target, get_targets
-
-def normalize_filter(filter_name):
-    """Normalize filter names to L, R, G, B, S, H, O."""
-    name = filter_name.upper().strip()
-    
-    if name in ["L", "LUM", "LUMINANCE"]:
-        return "L"
-    if name in ["R", "RED"]:
-        return "R"
-    if name in ["G", "GREEN"]:
-        return "G"
-    if name in ["B", "BLUE"]:
-        return "B"
-    
-    # Narrowband
-    if any(x in name for x in ["HA", "H-ALPHA", "H_ALPHA"]):
-        return "H"
-    if any(x in name for x in ["OIII", "O3", "O-III"]):
-        return "O"
-    if any(x in name for x in ["SII", "S2", "S-II"]):
-        return "S"
-        
-    return name
-
-def normalize_image_type(type_name):
-    """Normalize image type to LIGHT, FLAT, DARK, BIAS."""
-    name = type_name.upper().strip()
-    if any(x in name for x in ["LIGHT", "SUB"]):
-        return "LIGHT"
-    if "FLAT" in name:
-        return "FLAT"
-    if "DARK" in name:
-        return "DARK"
-    if "BIAS" in name:
-        return "BIAS"
-    return "LIGHT" # Default to LIGHT if unknown
-
-def get_fits_metadata(file_path):
-    try:
-        with fits.open(file_path) as hdul:
-            header = hdul[0].header
-            
-            # Common astronomical FITS keywords
-            target = header.get("OBJECT", "Unknown")
-            raw_filter = header.get("FILTER", "Unknown")
-            filter_name = normalize_filter(raw_filter)
-            
-            exptime = header.get("EXPTIME", header.get("EXPOSURE", 0))
-            date_obs = header.get("DATE-OBS", "Unknown")
-            
-            return {
-                "path": str(file_path),
-                "target_name": target,
-                "filter": filter_name,
-                "image_type": normalize_image_type(header.get("IMAGETYP", "LIGHT")),
-                "exptime_sec": float(exptime),
-                "date_obs": date_obs,
-                "fwhm": None, # Future calculation
-                "eccentricity": None, # Future calculation
-                "star_count": None, # Future calculation
-                "background": None, # Future calculation
-                "decision": "APPROVED",
-                "score": 1.0
-            }
-    except Exception as e:
-        print(f"Error reading {file_path}: {e}")
-        return None
-
-def is_file_stable(file_path, wait_time=2):
-    """Check if file size is stable (not currently being written)."""
-    size1 = os.path.getsize(file_path)
-    time.sleep(wait_time)
-    size2 = os.path.getsize(file_path)
-    return size1 == size2
-
-def scan_directory(directory_path):
-    path = Path(directory_path)
-    if not path.exists():
-        print(f"Directory {directory_path} does not exist.")
-        return
-
-    # Get known targets to automatically add new ones if found
-    known_targets = {t["name"] for t in get_targets()}
-
-    for file_path in path.rglob("*.fit*"): # Matches .fit, .fits, .fts
-        if not file_path.is_file():
-            continue
-            
-        # Basic stability check
-        # In a real app, we might check mtime or keep track of seen files
-        metadata = get_fits_metadata(file_path)
-        if metadata:
-            if metadata["target_name"] not in known_targets:
-                add_target(metadata["target_name"])
-                known_targets.add(metadata["target_name"])
-            
-            add_frame(metadata)
-            print(f"Scanned: {file_path.name} ({metadata['target_name']} - {metadata['filter']})")
-
-if __name__ == "__main__":
-    import sys
-    if len(sys.argv) > 1:
-        scan_directory(sys.argv[1])
-    else:
-        print("Usage: python -m nebulapilot.scanner <directory>")
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from astropy.io import fits
+from .db import add_frames_bulk, add_targets_bulk, get_targets
+
+try:
+    import fitsio
+except ImportError:
+    fitsio = None
+
+# Exact broadband aliases; narrowband names vary too much for exact matching
+_FILTER_ALIASES = {
+    "L": "L", "LUM": "L", "LUMINANCE": "L",
+    "R": "R", "RED": "R",
+    "G": "G", "GREEN": "G",
+    "B": "B", "BLUE": "B",
+}
+
+@lru_cache(maxsize=256)
+def normalize_filter(filter_name):
+    """Normalize filter names to L, R, G, B, S, H, O."""
+    name = filter_name.upper().strip()
+
+    alias = _FILTER_ALIASES.get(name)
+    if alias is not None:
+        return alias
+
+    # Narrowband
+    if any(x in name for x in ("HA", "H-ALPHA", "H_ALPHA")):
+        return "H"
+    if any(x in name for x in ("OIII", "O3", "O-III")):
+        return "O"
+    if any(x in name for x in ("SII", "S2", "S-II")):
+        return "S"
+
+    return name
+
+def normalize_image_type(type_name):
+    """Normalize image type to LIGHT, FLAT, DARK, BIAS."""
+    name = type_name.upper().strip()
+    if any(x in name for x in ["LIGHT", "SUB"]):
+        return "LIGHT"
+    if "FLAT" in name:
+        return "FLAT"
+    if "DARK" in name:
+        return "DARK"
+    if "BIAS" in name:
+        return "BIAS"
+    return "LIGHT" # Default to LIGHT if unknown
+
+def get_fits_metadata(file_path):
+    try:
+        # A valid FITS file is at least one 2880-byte header block, so
+        # anything smaller is a placeholder or an in-progress write — skip
+        # it without paying for a header parse attempt. Compressed files
+        # can legitimately be smaller on disk, so only reject empty ones.
+        size = os.path.getsize(file_path)
+        min_size = 1 if str(file_path).lower().endswith((".gz", ".fz")) else 2880
+        if size < min_size:
+            print(f"Skipping {file_path}: {size} bytes is too small for a FITS file")
+            return None
+
+        # Header-only read: no HDUList construction and no memmap setup for
+        # pixel data we never touch here. fitsio's C reader is noticeably
+        # faster than astropy for this, so prefer it when installed; both
+        # header objects expose the same .get() interface.
+        if fitsio is not None:
+            header = fitsio.read_header(str(file_path), ext=0)
+        else:
+            header = fits.getheader(file_path, ext=0)
+
+        # Common astronomical FITS keywords. Blank-valued cards ("FILTER ="
+        # with no value) come back as None rather than the .get() default,
+        # so coerce with `or` before the normalizers call str methods.
+        target = header.get("OBJECT") or "Unknown"
+        raw_filter = header.get("FILTER") or "Unknown"
+        filter_name = normalize_filter(raw_filter)
+
+        exptime = header.get("EXPTIME") or header.get("EXPOSURE") or 0
+        date_obs = header.get("DATE-OBS") or "Unknown"
+
+        return {
+            "path": str(file_path),
+            "target_name": target,
+            "filter": filter_name,
+            "image_type": normalize_image_type(header.get("IMAGETYP") or "LIGHT"),
+            "exptime_sec": float(exptime),
+            "date_obs": date_obs,
+            # Extra header keys consumers like is_frame_good may want,
+            # so they never have to reopen the FITS themselves
+            "ccd_temp": header.get("CCD-TEMP", None),
+            "gain": header.get("GAIN", None),
+            "fwhm": None, # Future calculation
+            "eccentricity": None, # Future calculation
+            "star_count": None, # Future calculation
+            "background": None, # Future calculation
+            "decision": "APPROVED",
+            "score": 1.0
+        }
+    except (OSError, ValueError, TypeError, fits.VerifyError) as e:
+        # Narrow catch: corrupt/truncated files and bad header values are
+        # expected during capture; anything else should propagate.
+        print(f"Error reading {file_path}: {e}")
+        return None
+
+# Last observed (size, mtime_ns) per path, for the in-progress-write check
+_seen_stats = {}
+
+def is_file_stable(file_path, min_age=5):
+    """
+    Check if a file is stable (not currently being written), without blocking.
+
+    Files whose mtime is older than min_age seconds are stable. Recently
+    modified files are recorded and reported unstable; a later scan pass
+    accepts them once their stat stops changing. This replaces the old
+    sleep-and-recheck, which idled 2 seconds per candidate file.
+    """
+    st = os.stat(file_path)
+    if time.time() - st.st_mtime > min_age:
+        return True
+    key = str(file_path)
+    current = (st.st_size, st.st_mtime_ns)
+    if _seen_stats.get(key) == current:
+        return True
+    _seen_stats[key] = current
+    return False
+
+# Recognized FITS suffixes; a C-level tuple-endswith beats fnmatch globbing
+# and, unlike the old "*.fit*" wildcard, is case-insensitive via lower().
+_FITS_EXTS = (".fit", ".fits", ".fts", ".fit.gz", ".fits.gz", ".fits.fz")
+
+def _iter_fits(root):
+    """
+    Yield FITS files under root using an os.scandir stack.
+
+    DirEntry serves its type from the directory read itself, so this
+    costs one stat per entry where rglob("*.fit*") needed several plus
+    fnmatch and a Path object for every directory entry.
+    """
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(_FITS_EXTS) and entry.is_file():
+                        yield Path(entry.path)
+        except OSError as e:
+            print(f"Error scanning {current}: {e}")
+
+def scan_directory(directory_path):
+    path = Path(directory_path)
+    if not path.exists():
+        print(f"Directory {directory_path} does not exist.")
+        return
+
+    # Get known targets to automatically add new ones if found
+    known_targets = {t["name"] for t in get_targets()}
+
+    # SQLite commit latency dominates per-row inserts, so accumulate rows
+    # and flush them in chunked transactions instead of committing per file.
+    new_targets = set()
+    pending_frames = []
+
+    def flush():
+        add_targets_bulk(new_targets)
+        add_frames_bulk(pending_frames)
+        new_targets.clear()
+        pending_frames.clear()
+
+    all_files = list(_iter_fits(path))
+
+    # Header reads are I/O-bound, so overlap the disk latency with a thread
+    # pool; DB batching stays on the main thread.
+    max_workers = min(32, (os.cpu_count() or 4) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        metadata_iter = executor.map(get_fits_metadata, all_files)
+        for file_path, metadata in zip(all_files, metadata_iter):
+            if metadata:
+                if metadata["target_name"] not in known_targets:
+                    new_targets.add(metadata["target_name"])
+                    known_targets.add(metadata["target_name"])
+
+                pending_frames.append(metadata)
+                print(f"Scanned: {file_path.name} ({metadata['target_name']} - {metadata['filter']})")
+
+                if len(pending_frames) >= 500:
+                    flush()
+
+    flush()
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        scan_directory(sys.argv[1])
+    else:
+        print("Usage: python -m nebulapilot.scanner <directory>")